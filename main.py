@@ -1,40 +1,154 @@
 # test-save-from-console
+import asyncio
+import base64
+import contextlib
+from collections.abc import AsyncIterator
 from datetime import datetime
+import json
+import logging
 import os
 import string
 import random
-
-from fastapi import FastAPI, HTTPException, Depends, Request, status
-from fastapi.responses import RedirectResponse, JSONResponse
-from pydantic import BaseModel, HttpUrl
+import uuid
+
+from cachetools import TTLCache
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, Query, Request, status
+from fastapi.responses import ORJSONResponse, RedirectResponse
+from pydantic import BaseModel, ConfigDict, HttpUrl, computed_field
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from sqlalchemy import (
-    create_engine,
+    event,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
     Column,
     Integer,
     String,
     DateTime,
     Boolean,
+    ForeignKey,
+    Index,
+    bindparam,
+    delete,
+    text,
 )
-from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm.attributes import set_committed_value
 
 # -------------------------------------------------------------------
 # Basic configuration
 # -------------------------------------------------------------------
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "shortlinks.db")
+DB_PATH = os.getenv("SHORTLINK_DB_PATH", os.path.join(BASE_DIR, "shortlinks.db"))
+
+DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+# Same file opened read-only, so the reader pool can never take the write lock.
+READ_DATABASE_URL = f"sqlite+aiosqlite:///file:{DB_PATH}?mode=ro&uri=true"
+
+# SQLite allows a single writer even in WAL mode: every mutation goes through
+# one pooled connection while reads scale with the available cores.
+write_engine = create_async_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0,
+)
+read_engine = create_async_engine(
+    READ_DATABASE_URL,
+    connect_args={"check_same_thread": False, "uri": True},
+    pool_size=os.cpu_count() or 1,
+)
 
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+# WAL lets readers proceed while the redirect path is writing click counts.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA foreign_keys=ON",
+)
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+if DATABASE_URL.startswith("sqlite"):
+
+    # Pool events are only available on the sync facade of an async engine.
+    @event.listens_for(write_engine.sync_engine, "connect")
+    @event.listens_for(read_engine.sync_engine, "connect")
+    def _set_sqlite_pragma(dbapi_conn, _) -> None:
+        cur = dbapi_conn.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cur.execute(pragma)
+        cur.close()
+
+    # Take the write lock up front (BEGIN IMMEDIATE) instead of upgrading a
+    # deferred transaction mid-flight, which is what surfaces SQLITE_BUSY.
+    # The driver's own BEGIN handling is disabled so ours is the only one.
+    @event.listens_for(write_engine.sync_engine, "connect")
+    def _disable_pysqlite_begin(dbapi_conn, _) -> None:
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(write_engine.sync_engine, "begin")
+    def _begin_immediate(conn) -> None:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+WriteSessionLocal = async_sessionmaker(
+    write_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+ReadSessionLocal = async_sessionmaker(
+    read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 # Optional: for when you later put this behind a domain like links.workpent.com
 BASE_SHORT_URL = os.getenv("BASE_SHORT_URL", "http://localhost:9500")
+SHORT_URL_PREFIX = BASE_SHORT_URL.rstrip("/") + "/"
+
+# Upper bound for ?limit= on /links
+MAX_PAGE_SIZE = 200
+
+logger = logging.getLogger("shortlink-api")
+
+# Optional: Redis cache in front of the redirect lookup (disabled when unset)
+REDIS_URL = os.getenv("REDIS_URL")
+LINK_CACHE_TTL = int(os.getenv("LINK_CACHE_TTL", "3600"))
+# Clicks are buffered (in Redis when enabled, else in the clicks log table) and
+# folded into shortlinks.click_count / last_clicked_at this often
+CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", "5"))
+CLICKS_KEY = "sl:clicks"
+LAST_CLICKED_KEY = "sl:last"
+# A flush renames both hashes here and deletes them only once SQLite commits
+CLICKS_STAGING_KEY = CLICKS_KEY + ":flushing"
+LAST_CLICKED_STAGING_KEY = LAST_CLICKED_KEY + ":flushing"
+# Field in the clicks staging hash naming the batch; the redirect route can't
+# match a code containing "/", so no click is ever counted under it
+FLUSH_BATCH_FIELD = "/batch"
+FLUSH_LOCK_KEY = "sl:flush-lock"
+FLUSH_LOCK_TTL = 60
+# Delete the lock only if it still holds our token: a flush that outlived the
+# TTL must not release the lock another worker has taken since
+RELEASE_FLUSH_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+redis_client: Redis | None = (
+    Redis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
+)
+
+# Per-process cache checked before Redis/SQLite. Deactivation only evicts the
+# worker that handled it, so other workers may redirect for up to the TTL.
+LOCAL_LINK_CACHE_SIZE = int(os.getenv("LOCAL_LINK_CACHE_SIZE", "100000"))
+LOCAL_LINK_CACHE_TTL = int(os.getenv("LOCAL_LINK_CACHE_TTL", "300"))
+local_link_cache: TTLCache = TTLCache(LOCAL_LINK_CACHE_SIZE, LOCAL_LINK_CACHE_TTL)
 
 # -------------------------------------------------------------------
 # Database model
@@ -53,9 +167,147 @@ class ShortLink(Base):
     active = Column(Boolean, default=True, nullable=False)
     note = Column(String(255), nullable=True)  # optional label/description
 
+    __table_args__ = (
+        # Covering index: the redirect lookup is answered without a row fetch
+        Index("ix_shortlinks_redirect", "short_code", "active", "target_url"),
+        # Keyset pagination order for /links
+        Index("ix_shortlinks_created_at_id", created_at.desc(), id.desc()),
+    )
+
+
+class Click(Base):
+    """Append-only click log, periodically rolled up into ShortLink."""
+
+    __tablename__ = "clicks"
+
+    id = Column(Integer, primary_key=True)
+    link_id = Column(Integer, ForeignKey("shortlinks.id"), index=True, nullable=False)
+    ts = Column(DateTime, nullable=False)
+
+
+class AppliedFlushBatch(Base):
+    """Last Redis click batch folded into ShortLink, so a retry can skip it."""
+
+    __tablename__ = "applied_flush_batches"
 
-def init_db() -> None:
-    Base.metadata.create_all(bind=engine)
+    batch_id = Column(String(32), primary_key=True)
+
+
+def create_missing_indexes(conn) -> None:
+    # create_all() only builds indexes along with a brand-new table
+    for index in ShortLink.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+# Trigger-maintained row count, so /links never has to COUNT(*) the table.
+LINK_STATS_DDL = (
+    "CREATE TABLE IF NOT EXISTS link_stats "
+    "(id INTEGER PRIMARY KEY, total INTEGER NOT NULL DEFAULT 0)",
+    # Seeded from the current count so an existing database starts out right
+    "INSERT OR IGNORE INTO link_stats (id, total) SELECT 1, COUNT(*) FROM shortlinks",
+    "CREATE TRIGGER IF NOT EXISTS shortlinks_ai AFTER INSERT ON shortlinks "
+    "BEGIN UPDATE link_stats SET total = total + 1 WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS shortlinks_ad AFTER DELETE ON shortlinks "
+    "BEGIN UPDATE link_stats SET total = total - 1 WHERE id = 1; END",
+)
+
+
+async def init_db() -> None:
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes)
+        for statement in LINK_STATS_DDL:
+            await conn.exec_driver_sql(statement)
+
+
+# -------------------------------------------------------------------
+# Prebuilt statements: constructed once, requests only bind parameters
+# -------------------------------------------------------------------
+
+# SQLite always plans a lookup on short_code through its unique index, so the
+# covering index has to be named explicitly for the redirect query to use it.
+REDIRECT_LOOKUP = text(
+    "SELECT id, target_url FROM shortlinks INDEXED BY ix_shortlinks_redirect "
+    "WHERE short_code = :code AND active = 1"
+)
+
+LINK_BY_CODE = select(ShortLink).where(ShortLink.short_code == bindparam("code"))
+
+LINK_TOTAL = text("SELECT total FROM link_stats WHERE id = 1")
+
+INSERT_LINK = (
+    sqlite_insert(ShortLink)
+    .values(
+        short_code=bindparam("code"),
+        target_url=bindparam("url"),
+        note=bindparam("link_note"),
+    )
+    .on_conflict_do_nothing(index_elements=["short_code"])
+    .returning(ShortLink)
+)
+
+LOG_CLICK = insert(Click.__table__)
+
+UNROLLED_CLICKS = select(func.count(Click.id), func.max(Click.ts)).where(
+    Click.link_id == bindparam("link_id")
+)
+
+# Folds the click log into the per-link counters. Runs under the write lock
+# (BEGIN IMMEDIATE), so no click can be logged between this and the DELETE.
+# last_clicked_at only moves forward: clicks logged during a Redis outage can
+# be older than a batch the Redis flush has already applied.
+ROLLUP_CLICKS = text(
+    "UPDATE shortlinks SET click_count = click_count + c.n, "
+    "last_clicked_at = MAX(COALESCE(last_clicked_at, c.last), c.last) "
+    "FROM (SELECT link_id, COUNT(*) AS n, MAX(ts) AS last FROM clicks GROUP BY link_id) AS c "
+    "WHERE shortlinks.id = c.link_id"
+)
+
+CLEAR_CLICK_LOG = text("DELETE FROM clicks")
+
+CLICK_LOG_HAS_ROWS = text("SELECT EXISTS (SELECT 1 FROM clicks)")
+
+DEACTIVATE_LINK = (
+    update(ShortLink)
+    .where(ShortLink.id == bindparam("link_id"))
+    .values(active=False)
+    # deactivate_link updates the loaded object itself
+    .execution_options(synchronize_session=False)
+)
+
+# Core (not ORM) statement so a list of parameters runs as one executemany
+FLUSH_CLICKS = (
+    update(ShortLink.__table__)
+    .where(ShortLink.__table__.c.short_code == bindparam("code"))
+    .values(
+        click_count=ShortLink.__table__.c.click_count + bindparam("delta"),
+        # Same forward-only rule as ROLLUP_CLICKS
+        last_clicked_at=func.max(
+            func.coalesce(
+                ShortLink.__table__.c.last_clicked_at,
+                bindparam("last", type_=DateTime),
+            ),
+            bindparam("last", type_=DateTime),
+            type_=DateTime,
+        ),
+    )
+)
+
+# Recorded in the same transaction as FLUSH_CLICKS; no row back means the
+# batch was already applied by an earlier attempt.
+RECORD_FLUSH_BATCH = (
+    sqlite_insert(AppliedFlushBatch.__table__)
+    .values(batch_id=bindparam("batch_id"))
+    .on_conflict_do_nothing(index_elements=["batch_id"])
+    .returning(AppliedFlushBatch.__table__.c.batch_id)
+)
+
+# Only one batch is ever staged at a time, so only the newest has to be kept
+PRUNE_FLUSH_BATCHES = delete(AppliedFlushBatch.__table__).where(
+    AppliedFlushBatch.__table__.c.batch_id != bindparam("batch_id")
+)
+
+LAST_FLUSH_BATCH = select(AppliedFlushBatch.batch_id)
 
 
 # -------------------------------------------------------------------
@@ -70,8 +322,9 @@ class CreateLinkRequest(BaseModel):
 
 
 class ShortLinkResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     short_code: str
-    short_url: str
     target_url: str
     created_at: datetime
     click_count: int
@@ -79,8 +332,15 @@ class ShortLinkResponse(BaseModel):
     active: bool
     note: str | None = None
 
+    @computed_field
+    @property
+    def short_url(self) -> str:
+        return build_short_url(self.short_code)
+
 
 class StatsResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     short_code: str
     target_url: str
     created_at: datetime
@@ -93,29 +353,287 @@ class StatsResponse(BaseModel):
 class ListLinksResponse(BaseModel):
     total: int
     items: list[ShortLinkResponse]
+    next_cursor: str | None = None  # pass back as ?cursor= for the next page
 
 
 # -------------------------------------------------------------------
 # Helpers
 # -------------------------------------------------------------------
 
+SHORT_CODE_CHARS = string.ascii_letters + string.digits
 
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
+# Bound once: the redirect path stamps every click with it
+_utcnow = datetime.utcnow
+
+
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    async with ReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def get_write_db() -> AsyncIterator[AsyncSession]:
+    async with WriteSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
 
 
 def generate_short_code(length: int = 7) -> str:
-    chars = string.ascii_letters + string.digits
-    return "".join(random.choice(chars) for _ in range(length))
+    return "".join(random.choices(SHORT_CODE_CHARS, k=length))
+
+
+async def insert_link(
+    db: AsyncSession, short_code: str, payload: CreateLinkRequest
+) -> ShortLink | None:
+    """Insert a new link, or return None if `short_code` is already taken."""
+    params = {"code": short_code, "url": str(payload.url), "link_note": payload.note}
+    return (await db.scalars(INSERT_LINK, params)).one_or_none()
+
+
+def encode_cursor(link: ShortLink) -> str:
+    raw = f"{link.created_at.isoformat()}|{link.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, link_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(created_at), int(link_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+        )
 
 
 def build_short_url(code: str) -> str:
     # BASE_SHORT_URL can be something like https://lnk.workpent.com later
-    return f"{BASE_SHORT_URL.rstrip('/')}/{code}"
+    return SHORT_URL_PREFIX + code
+
+
+def link_cache_key(code: str) -> str:
+    return f"sl:url:{code}"
+
+
+async def cache_get_link(code: str) -> dict | None:
+    entry = local_link_cache.get(code)
+    if entry is not None or redis_client is None:
+        return entry
+    try:
+        raw = await redis_client.get(link_cache_key(code))
+    except RedisError:
+        # Redis is only a cache: treat an outage as a miss and go to SQLite
+        logger.warning("Redis cache read failed for %s", code, exc_info=True)
+        return None
+    if not raw:
+        return None
+    entry = local_link_cache[code] = json.loads(raw)
+    return entry
+
+
+async def cache_set_link(
+    code: str,
+    target_url: str,
+    link_id: int,
+    active: bool = True,
+    replace: bool = True,
+    required: bool = False,
+) -> dict:
+    """Cache a link and return the entry now in effect for `code`.
+
+    Deactivation writes an inactive entry (a tombstone) rather than deleting
+    the key. Populating after a DB read passes replace=False so a tombstone
+    written after that read is never overwritten with a stale active entry.
+    With required=True a failed Redis write raises RedisError instead of
+    only being logged.
+    """
+    # "u" = target url, "a" = active, "i" = row id (for the click update)
+    entry = {"u": target_url, "a": active, "i": link_id}
+    if redis_client is not None:
+        key = link_cache_key(code)
+        try:
+            stored = await redis_client.set(
+                key, json.dumps(entry), ex=LINK_CACHE_TTL, nx=not replace
+            )
+            if not stored:
+                # Already cached (possibly a newer tombstone): that entry wins
+                raw = await redis_client.get(key)
+                if raw:
+                    entry = json.loads(raw)
+                    local_link_cache[code] = entry
+                    return entry
+        except RedisError:
+            if required:
+                # This worker at least stops using the old entry
+                local_link_cache[code] = entry
+                raise
+            logger.warning("Redis cache write failed for %s", code, exc_info=True)
+    if replace:
+        local_link_cache[code] = entry
+        return entry
+    return local_link_cache.setdefault(code, entry)
+
+
+async def record_click(code: str, link_id: int, clicked_at: datetime) -> None:
+    """Count a redirect; runs as a background task after the 307 is sent."""
+    if redis_client is not None:
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hincrby(CLICKS_KEY, code, 1)
+                pipe.hset(LAST_CLICKED_KEY, code, clicked_at.isoformat())
+                await pipe.execute()
+            return
+        except RedisError:
+            # Don't drop the click: fall back to the SQLite click log
+            logger.warning("Redis click buffer failed for %s", code, exc_info=True)
+
+    async with WriteSessionLocal() as db:
+        await db.execute(LOG_CLICK, {"link_id": link_id, "ts": clicked_at})
+        await db.commit()
+
+
+async def logged_clicks(
+    db: AsyncSession, link_id: int
+) -> tuple[int, datetime | None, str | None]:
+    """SQLite side of a link's pending clicks, read alongside the link row.
+
+    Returns the count and latest click still in the click log (used without
+    Redis, and as a fallback when it is down), plus the last Redis batch
+    already applied, which buffered_clicks needs to skip it.
+    """
+    count, last = (await db.execute(UNROLLED_CLICKS, {"link_id": link_id})).one()
+    applied_batch = None
+    if redis_client is not None:
+        applied_batch = (await db.execute(LAST_FLUSH_BATCH)).scalar_one_or_none()
+    return count, last, applied_batch
+
+
+async def buffered_clicks(
+    code: str, applied_batch: str | None
+) -> tuple[int, datetime | None]:
+    """Redis side of a link's pending clicks; makes no database calls."""
+    if redis_client is None:
+        return 0, None
+
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in (CLICKS_KEY, CLICKS_STAGING_KEY):
+                pipe.hget(key, code)
+            for key in (LAST_CLICKED_KEY, LAST_CLICKED_STAGING_KEY):
+                pipe.hget(key, code)
+            pipe.hget(CLICKS_STAGING_KEY, FLUSH_BATCH_FIELD)
+            buffered, staged, buffered_last, staged_last, staged_batch = (
+                await pipe.execute()
+            )
+    except RedisError:
+        logger.warning("Redis click buffer read failed for %s", code, exc_info=True)
+        return 0, None
+
+    if staged_batch is not None and staged_batch == applied_batch:
+        # Already in click_count; the staging keys just haven't been deleted
+        staged = staged_last = None
+    count = int(buffered or 0) + int(staged or 0)
+    last = None
+    for value in (buffered_last, staged_last):
+        if value:
+            value = datetime.fromisoformat(value)
+            last = max(last, value) if last else value
+    return count, last
+
+
+async def build_stats(
+    link: ShortLink, logged: tuple[int, datetime | None, str | None]
+) -> StatsResponse:
+    """StatsResponse for `link`, including clicks not rolled up yet.
+
+    `logged` comes from logged_clicks(). The Redis buffer is read here, so a
+    caller holding the write transaction can commit before calling this.
+    """
+    count, last, applied_batch = logged
+    buffered, buffered_last = await buffered_clicks(link.short_code, applied_batch)
+    stats = StatsResponse.model_validate(link)
+    stats.click_count += count + buffered
+    for pending_last in (last, buffered_last):
+        if pending_last and (
+            stats.last_clicked_at is None or pending_last > stats.last_clicked_at
+        ):
+            stats.last_clicked_at = pending_last
+    return stats
+
+
+async def apply_staged_clicks() -> None:
+    """Fold the staged click batch into SQLite, then drop it from Redis."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hgetall(CLICKS_STAGING_KEY)
+        pipe.hgetall(LAST_CLICKED_STAGING_KEY)
+        clicks, last_clicked = await pipe.execute()
+    batch_id = clicks.pop(FLUSH_BATCH_FIELD)
+
+    params = [
+        {
+            "code": code,
+            "delta": int(delta),
+            "last": datetime.fromisoformat(last_clicked[code]),
+        }
+        for code, delta in clicks.items()
+    ]
+    # The batch id commits with the counts, so a batch whose staging keys
+    # outlived a successful commit (failed DEL, crash) is not added twice
+    async with WriteSessionLocal() as db:
+        batch = {"batch_id": batch_id}
+        if (await db.execute(RECORD_FLUSH_BATCH, batch)).first() is not None:
+            await db.execute(FLUSH_CLICKS, params)
+            await db.execute(PRUNE_FLUSH_BATCHES, batch)
+        await db.commit()
+
+    # Only drop the staged batch once SQLite has it
+    await redis_client.delete(CLICKS_STAGING_KEY, LAST_CLICKED_STAGING_KEY)
+
+
+async def flush_clicks() -> None:
+    # One flusher at a time across workers
+    token = uuid.uuid4().hex
+    if not await redis_client.set(FLUSH_LOCK_KEY, token, nx=True, ex=FLUSH_LOCK_TTL):
+        return
+    try:
+        # A batch left staged by a failed or interrupted flush goes first
+        if await redis_client.exists(CLICKS_STAGING_KEY):
+            await apply_staged_clicks()
+        if not await redis_client.exists(CLICKS_KEY):
+            return
+        # Both hashes move together so no click lands in between
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.rename(CLICKS_KEY, CLICKS_STAGING_KEY)
+            pipe.rename(LAST_CLICKED_KEY, LAST_CLICKED_STAGING_KEY)
+            pipe.hset(CLICKS_STAGING_KEY, FLUSH_BATCH_FIELD, uuid.uuid4().hex)
+            await pipe.execute()
+        await apply_staged_clicks()
+    finally:
+        await redis_client.eval(RELEASE_FLUSH_LOCK, 1, FLUSH_LOCK_KEY, token)
+
+
+async def rollup_clicks() -> None:
+    # Check from the reader pool first: an empty log (the norm with Redis
+    # enabled) shouldn't cost the writer connection and a BEGIN IMMEDIATE.
+    async with ReadSessionLocal() as db:
+        if not (await db.execute(CLICK_LOG_HAS_ROWS)).scalar_one():
+            return
+    async with WriteSessionLocal() as db:
+        await db.execute(ROLLUP_CLICKS)
+        await db.execute(CLEAR_CLICK_LOG)
+        await db.commit()
+
+
+async def flush_clicks_loop() -> None:
+    while True:
+        await asyncio.sleep(CLICK_FLUSH_INTERVAL)
+        try:
+            if redis_client is not None:
+                await flush_clicks()
+            await rollup_clicks()
+        except Exception:
+            logger.exception("Failed to flush buffered clicks")
 
 
 # -------------------------------------------------------------------
@@ -126,15 +644,30 @@ app = FastAPI(
     title="Workpent Shortlink API",
     description="Minimal commercial-ready link shortener API.",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
-
 
 @app.on_event("startup")
-def on_startup() -> None:
-    init_db()
+async def on_startup() -> None:
+    await init_db()
+    app.state.click_flusher = asyncio.create_task(flush_clicks_loop())
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    app.state.click_flusher.cancel()
+    # Let an in-progress flush unwind (and release its lock) before the final
+    # flush below and before Redis is closed under it
+    with contextlib.suppress(asyncio.CancelledError):
+        await app.state.click_flusher
+    if redis_client is not None:
+        try:
+            await flush_clicks()
+        except RedisError:
+            # Buffered clicks stay in Redis for the next flusher to pick up
+            logger.warning("Final click flush skipped: Redis unavailable", exc_info=True)
+        await redis_client.aclose()
+    await rollup_clicks()
 
 
 # -------------------------------------------------------------------
@@ -143,8 +676,9 @@ def on_startup() -> None:
 
 
 @app.get("/health")
-def health() -> dict:
-    return {"status": "ok", "app": "shortlink-api", "time": datetime.utcnow().isoformat()}
+async def health(db: AsyncSession = Depends(get_read_db)) -> dict:
+    await db.execute(text("SELECT 1"))
+    return {"status": "ok", "app": "shortlink-api", "time": _utcnow()}
 
 
 @app.post(
@@ -152,30 +686,22 @@ def health() -> dict:
     response_model=ShortLinkResponse,
     status_code=status.HTTP_201_CREATED,
 )
-def create_link(payload: CreateLinkRequest, db: Session = Depends(get_db)):
+async def create_link(payload: CreateLinkRequest, db: AsyncSession = Depends(get_write_db)):
     # Optional: enforce simple domain allowlist later.
 
-    # If custom code requested, check it's free
+    # The unique index on short_code decides whether a code is free
     if payload.custom_code:
-        existing = db.query(ShortLink).filter(
-            ShortLink.short_code == payload.custom_code
-        ).first()
-        if existing:
+        link = await insert_link(db, payload.custom_code, payload)
+        if link is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Custom code already in use.",
             )
-        short_code = payload.custom_code
     else:
-        # Auto-generate and ensure uniqueness
+        # Auto-generate and retry on collision
         for _ in range(10):
-            short_code = generate_short_code()
-            existing = (
-                db.query(ShortLink)
-                .filter(ShortLink.short_code == short_code)
-                .first()
-            )
-            if not existing:
+            link = await insert_link(db, generate_short_code(), payload)
+            if link is not None:
                 break
         else:
             raise HTTPException(
@@ -183,42 +709,10 @@ def create_link(payload: CreateLinkRequest, db: Session = Depends(get_db)):
                 detail="Failed to generate unique short code.",
             )
 
-    link = ShortLink(
-        short_code=short_code,
-        target_url=str(payload.url),
-        note=payload.note,
-    )
-    db.add(link)
-    db.commit()
-    db.refresh(link)
-
-    return ShortLinkResponse(
-        short_code=link.short_code,
-        short_url=build_short_url(link.short_code),
-        target_url=link.target_url,
-        created_at=link.created_at,
-        click_count=link.click_count,
-        last_clicked_at=link.last_clicked_at,
-        active=link.active,
-        note=link.note,
-    )
-
-
-@app.get("/{code}", response_class=RedirectResponse)
-def redirect_link(code: str, request: Request, db: Session = Depends(get_db)):
-    link = (
-        db.query(ShortLink)
-        .filter(ShortLink.short_code == code, ShortLink.active == True)  # noqa: E712
-        .first()
-    )
-    if not link:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found.")
-
-    link.click_count += 1
-    link.last_clicked_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    await cache_set_link(link.short_code, link.target_url, link.id)
 
-    return RedirectResponse(url=link.target_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    return link
 
 
 # -------------------------------------------------------------------
@@ -227,65 +721,88 @@ def redirect_link(code: str, request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/stats/{code}", response_model=StatsResponse)
-def get_stats(code: str, db: Session = Depends(get_db)):
-    link = db.query(ShortLink).filter(ShortLink.short_code == code).first()
+async def get_stats(code: str, db: AsyncSession = Depends(get_read_db)):
+    link = (await db.execute(LINK_BY_CODE, {"code": code})).scalar_one_or_none()
     if not link:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found.")
 
-    return StatsResponse(
-        short_code=link.short_code,
-        target_url=link.target_url,
-        created_at=link.created_at,
-        click_count=link.click_count,
-        last_clicked_at=link.last_clicked_at,
-        active=link.active,
-        note=link.note,
-    )
+    return await build_stats(link, await logged_clicks(db, link.id))
 
 
 @app.get("/links", response_model=ListLinksResponse)
-def list_links(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 50,
+async def list_links(
+    db: AsyncSession = Depends(get_read_db),
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
 ):
-    q = db.query(ShortLink).order_by(ShortLink.created_at.desc())
-    total = q.count()
-    items_raw = q.offset(skip).limit(limit).all()
-
-    items = [
-        ShortLinkResponse(
-            short_code=link.short_code,
-            short_url=build_short_url(link.short_code),
-            target_url=link.target_url,
-            created_at=link.created_at,
-            click_count=link.click_count,
-            last_clicked_at=link.last_clicked_at,
-            active=link.active,
-            note=link.note,
+    total = (await db.execute(LINK_TOTAL)).scalar_one()
+
+    # Keyset pagination: seek past the last row of the previous page instead
+    # of OFFSET, so deep pages cost the same as the first one.
+    stmt = (
+        select(ShortLink)
+        .order_by(ShortLink.created_at.desc(), ShortLink.id.desc())
+        .limit(limit)
+    )
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(ShortLink.created_at, ShortLink.id) < tuple_(after_created_at, after_id)
         )
-        for link in items_raw
-    ]
+    items = (await db.execute(stmt)).scalars().all()
+
+    next_cursor = encode_cursor(items[-1]) if items and len(items) == limit else None
 
-    return ListLinksResponse(total=total, items=items)
+    return ListLinksResponse(total=total, items=items, next_cursor=next_cursor)
 
 
 @app.post("/links/{code}/deactivate", response_model=StatsResponse)
-def deactivate_link(code: str, db: Session = Depends(get_db)):
-    link = db.query(ShortLink).filter(ShortLink.short_code == code).first()
+async def deactivate_link(code: str, db: AsyncSession = Depends(get_write_db)):
+    link = (await db.execute(LINK_BY_CODE, {"code": code})).scalar_one_or_none()
     if not link:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found.")
-    link.active = False
-    db.commit()
-    db.refresh(link)
-
-    return StatsResponse(
-        short_code=link.short_code,
-        target_url=link.target_url,
-        created_at=link.created_at,
-        click_count=link.click_count,
-        last_clicked_at=link.last_clicked_at,
-        active=link.active,
-        note=link.note,
-    )
+    await db.execute(DEACTIVATE_LINK, {"link_id": link.id})
+    # Only `active` changed, so patch it in rather than re-SELECTing the row
+    set_committed_value(link, "active", False)
+    # Only the SQLite part of the pending clicks is read under the write lock;
+    # the Redis buffer is merged in after the commit
+    logged = await logged_clicks(db, link.id)
+    await db.commit()
+    try:
+        await cache_set_link(code, link.target_url, link.id, active=False, required=True)
+    except RedisError:
+        # The cached active entry would keep redirecting on every worker for
+        # up to LINK_CACHE_TTL; deactivating again retries the tombstone
+        logger.exception("Failed to cache tombstone for deactivated %s", code)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Link deactivated, but cached redirects could not be cleared. Retry.",
+        )
+
+    return await build_stats(link, logged)
+
+
+# -------------------------------------------------------------------
+# Redirect (catch-all, so it is registered after every other route)
+# -------------------------------------------------------------------
+
+
+@app.get("/{code}", response_class=RedirectResponse)
+async def redirect_link(
+    code: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_read_db),
+):
+    cached = await cache_get_link(code)
+    if cached is None:
+        row = (await db.execute(REDIRECT_LOOKUP, {"code": code})).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found.")
+        cached = await cache_set_link(code, row.target_url, row.id, replace=False)
+    if not cached["a"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found.")
+
+    background_tasks.add_task(record_click, code, cached["i"], _utcnow())
 
+    return RedirectResponse(url=cached["u"], status_code=status.HTTP_307_TEMPORARY_REDIRECT)
@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import tempfile
+
+import fakeredis
+import pytest
+
+# Point the app at a throwaway database before main is imported
+_tmpdir = tempfile.mkdtemp(prefix="shortlink-test-")
+os.environ["SHORTLINK_DB_PATH"] = os.path.join(_tmpdir, "shortlinks.db")
+os.environ.pop("REDIS_URL", None)
+# Tests drive flush_clicks/rollup_clicks themselves
+os.environ["CLICK_FLUSH_INTERVAL"] = "3600"
+
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture
+def db_path(client):
+    # Each test starts from empty tables; link_stats follows via its triggers
+    conn = sqlite3.connect(main.DB_PATH)
+    conn.execute("DELETE FROM clicks")
+    conn.execute("DELETE FROM applied_flush_batches")
+    conn.execute("DELETE FROM shortlinks")
+    conn.commit()
+    conn.close()
+    main.local_link_cache.clear()
+    return main.DB_PATH
+
+
+@pytest.fixture
+def redis(db_path, monkeypatch):
+    # In-memory stand-in for REDIS_URL, swapped in for a single test
+    fake = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(main, "redis_client", fake)
+    return fake
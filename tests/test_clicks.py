@@ -0,0 +1,150 @@
+import sqlite3
+
+import pytest
+from redis.exceptions import RedisError
+
+import main
+from test_links import create_links
+
+
+def stored_click_count(db_path, code):
+    conn = sqlite3.connect(db_path)
+    (count,) = conn.execute(
+        "SELECT click_count FROM shortlinks WHERE short_code = ?", (code,)
+    ).fetchone()
+    conn.close()
+    return count
+
+
+def click(client, code, times):
+    for _ in range(times):
+        assert client.get(f"/{code}", follow_redirects=False).status_code == 307
+
+
+def test_flush_folds_buffered_clicks_into_link(client, redis):
+    (code,) = create_links(client, 1)
+    click(client, code, 3)
+    assert client.get(f"/stats/{code}").json()["click_count"] == 3
+
+    client.portal.call(main.flush_clicks)
+
+    assert stored_click_count(main.DB_PATH, code) == 3
+    assert client.portal.call(redis.exists, main.CLICKS_STAGING_KEY) == 0
+    assert client.get(f"/stats/{code}").json()["click_count"] == 3
+
+
+def test_flush_does_not_reapply_batch_after_failed_staging_delete(
+    client, redis, monkeypatch
+):
+    (code,) = create_links(client, 1)
+    click(client, code, 4)
+
+    delete = redis.delete
+
+    async def delete_fails_for_staging(*keys):
+        if main.CLICKS_STAGING_KEY in keys:
+            monkeypatch.setattr(redis, "delete", delete)
+            raise RedisError("connection lost")
+        return await delete(*keys)
+
+    monkeypatch.setattr(redis, "delete", delete_fails_for_staging)
+    with pytest.raises(RedisError):
+        client.portal.call(main.flush_clicks)
+
+    # Committed to SQLite but still staged: counted once, not twice
+    assert stored_click_count(main.DB_PATH, code) == 4
+    assert client.portal.call(redis.exists, main.CLICKS_STAGING_KEY) == 1
+    assert client.get(f"/stats/{code}").json()["click_count"] == 4
+
+    client.portal.call(main.flush_clicks)
+
+    assert stored_click_count(main.DB_PATH, code) == 4
+    assert client.portal.call(redis.exists, main.CLICKS_STAGING_KEY) == 0
+    assert client.get(f"/stats/{code}").json()["click_count"] == 4
+
+
+def test_flush_retries_batch_after_failed_sqlite_write(client, redis, monkeypatch):
+    (code,) = create_links(client, 1)
+    click(client, code, 2)
+
+    def failing_sessionmaker():
+        raise sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as m:
+        m.setattr(main, "WriteSessionLocal", failing_sessionmaker)
+        with pytest.raises(sqlite3.OperationalError):
+            client.portal.call(main.flush_clicks)
+
+    click(client, code, 1)
+    # Staged batch plus the click buffered since
+    assert client.get(f"/stats/{code}").json()["click_count"] == 3
+
+    # One flush applies the leftover batch, then the live buffer
+    client.portal.call(main.flush_clicks)
+    assert stored_click_count(main.DB_PATH, code) == 3
+    assert client.get(f"/stats/{code}").json()["click_count"] == 3
+
+
+def test_flush_leaves_lock_taken_over_by_another_worker(client, redis, monkeypatch):
+    (code,) = create_links(client, 1)
+    click(client, code, 1)
+
+    session_execute = main.AsyncSession.execute
+
+    # Our lock expires while the batch is being written and another worker
+    # takes it
+    async def execute_then_lose_lock(self, statement, *args, **kwargs):
+        if statement is main.FLUSH_CLICKS:
+            await redis.set(main.FLUSH_LOCK_KEY, "other-worker")
+        return await session_execute(self, statement, *args, **kwargs)
+
+    monkeypatch.setattr(main.AsyncSession, "execute", execute_then_lose_lock)
+    client.portal.call(main.flush_clicks)
+
+    assert client.portal.call(redis.get, main.FLUSH_LOCK_KEY) == "other-worker"
+    assert stored_click_count(main.DB_PATH, code) == 1
+
+
+def test_older_logged_clicks_do_not_move_last_clicked_at_back(client, redis):
+    (code,) = create_links(client, 1)
+    click(client, code, 1)
+    # A click that fell back to the SQLite log during an earlier Redis outage
+    conn = sqlite3.connect(main.DB_PATH)
+    conn.execute(
+        "INSERT INTO clicks (link_id, ts) "
+        "SELECT id, '2020-01-01 00:00:00.000000' FROM shortlinks WHERE short_code = ?",
+        (code,),
+    )
+    conn.commit()
+    conn.close()
+    buffered_last = client.get(f"/stats/{code}").json()["last_clicked_at"]
+    assert not buffered_last.startswith("2020")
+
+    # Same order as flush_clicks_loop: the Redis batch, then the click log
+    client.portal.call(main.flush_clicks)
+    client.portal.call(main.rollup_clicks)
+
+    stats = client.get(f"/stats/{code}").json()
+    assert stats["click_count"] == 2
+    assert stats["last_clicked_at"] == buffered_last
+
+
+def test_deactivate_reads_redis_buffer_after_releasing_writer(
+    client, redis, monkeypatch
+):
+    (code,) = create_links(client, 1)
+    click(client, code, 2)
+
+    buffered_clicks = main.buffered_clicks
+    writer_checked_out = []
+
+    async def tracking_buffered_clicks(*args):
+        writer_checked_out.append(main.write_engine.pool.checkedout())
+        return await buffered_clicks(*args)
+
+    monkeypatch.setattr(main, "buffered_clicks", tracking_buffered_clicks)
+    resp = client.post(f"/links/{code}/deactivate")
+
+    assert resp.status_code == 200
+    assert resp.json()["click_count"] == 2
+    assert writer_checked_out == [0]
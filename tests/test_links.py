@@ -0,0 +1,111 @@
+import sqlite3
+
+from redis.exceptions import RedisError
+
+import main
+
+
+def create_links(client, n):
+    return [
+        client.post("/links", json={"url": f"https://example.com/{i}"}).json()["short_code"]
+        for i in range(n)
+    ]
+
+
+def page_through(client, limit):
+    codes, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get("/links", params=params)
+        assert resp.status_code == 200
+        body = resp.json()
+        codes += [item["short_code"] for item in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return codes, body["total"]
+
+
+def test_list_links_cursor_round_trip(client, db_path):
+    codes = create_links(client, 7)
+
+    seen, total = page_through(client, limit=3)
+
+    assert total == 7
+    assert seen == list(reversed(codes))
+
+
+def test_list_links_cursor_with_tied_created_at(client, db_path):
+    codes = create_links(client, 5)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE shortlinks SET created_at = '2025-01-01 00:00:00.000000'")
+    conn.commit()
+    conn.close()
+
+    seen, _ = page_through(client, limit=2)
+
+    # Ties on created_at fall back to id, so no row is skipped or repeated
+    assert seen == list(reversed(codes))
+
+
+def test_list_links_invalid_cursor(client, db_path):
+    resp = client.get("/links", params={"cursor": "not-a-cursor"})
+
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "Invalid cursor."}
+
+
+def test_list_links_rejects_out_of_range_limit(client, db_path):
+    assert client.get("/links", params={"limit": 0}).status_code == 422
+    assert client.get("/links", params={"limit": 10_000}).status_code == 422
+
+
+def test_deactivate_reports_clicks_not_rolled_up_yet(client, db_path):
+    (code,) = create_links(client, 1)
+    for _ in range(2):
+        assert client.get(f"/{code}", follow_redirects=False).status_code == 307
+
+    resp = client.post(f"/links/{code}/deactivate")
+
+    assert resp.status_code == 200
+    assert resp.json()["active"] is False
+    assert resp.json()["click_count"] == 2
+    assert client.get(f"/stats/{code}").json()["click_count"] == 2
+    assert client.get(f"/{code}", follow_redirects=False).status_code == 404
+
+
+def test_deactivate_fails_loudly_when_tombstone_cannot_be_cached(
+    client, redis, monkeypatch
+):
+    (code,) = create_links(client, 1)
+    assert client.get(f"/{code}", follow_redirects=False).status_code == 307
+
+    async def set_fails(*args, **kwargs):
+        raise RedisError("connection lost")
+
+    with monkeypatch.context() as m:
+        m.setattr(redis, "set", set_fails)
+        resp = client.post(f"/links/{code}/deactivate")
+    assert resp.status_code == 503
+
+    # The active entry is still in Redis, so a retry must replace it
+    assert client.post(f"/links/{code}/deactivate").status_code == 200
+    main.local_link_cache.clear()
+    assert client.get(f"/{code}", follow_redirects=False).status_code == 404
+
+
+def test_rollup_folds_click_log_into_link(client, db_path):
+    (code,) = create_links(client, 1)
+    for _ in range(3):
+        client.get(f"/{code}", follow_redirects=False)
+
+    client.portal.call(main.rollup_clicks)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM clicks").fetchone() == (0,)
+    assert conn.execute(
+        "SELECT click_count FROM shortlinks WHERE short_code = ?", (code,)
+    ).fetchone() == (3,)
+    conn.close()
+    assert client.get(f"/stats/{code}").json()["click_count"] == 3